@@ -25,7 +25,8 @@ interface AnalysisResult {
     capacity_utilization: number
   }
   structured_analysis: {
-    suitability_assessment: {
+    // Sections the AI could not produce are omitted by the backend
+    suitability_assessment?: {
       overall_score: number
       factors: string[]
     }
@@ -35,7 +36,7 @@ interface AnalysisResult {
       total_savings_25_years: number
       investment_grade: string
     }
-    technical_recommendations: string[]
+    technical_recommendations?: string[]
     environmental_impact: {
       co2_reduction_tons: number
       equivalent_trees: number
@@ -51,13 +52,13 @@ interface AnalysisResult {
       estimated_quote: string
       certifications: string[]
     }>
-    government_incentives: {
+    government_incentives?: {
       central_subsidy: number
       state_subsidy: number
       net_metering_available: boolean
       tax_benefits: string
     }
-    installation_timeline: {
+    installation_timeline?: {
       site_survey: string
       approvals: string
       installation: string
@@ -90,7 +91,7 @@ interface AnalysisResult {
   }
   recommendations: {
     is_suitable: boolean
-    confidence_score: number
+    confidence_score: number | null
     priority_actions: string[]
   }
 }
@@ -133,6 +134,7 @@ export default function ResultsPage() {
     if (!analysisResult) return
 
     const { solar_metrics, structured_analysis, location, weather_data } = analysisResult
+    const unavailable = 'Not available for this analysis'
 
     // Create Word document content
     const documentContent = `
@@ -172,10 +174,10 @@ Investment Grade: ${structured_analysis.financial_analysis.investment_grade}
 
 SUITABILITY ASSESSMENT
 =================================================================
-Overall Suitability Score: ${structured_analysis.suitability_assessment.overall_score}%
+${structured_analysis.suitability_assessment ? `Overall Suitability Score: ${structured_analysis.suitability_assessment.overall_score}%
 
 Key Factors:
-${structured_analysis.suitability_assessment.factors.map(factor => `• ${factor}`).join('\n')}
+${structured_analysis.suitability_assessment.factors.map(factor => `• ${factor}`).join('\n')}` : unavailable}
 
 ENVIRONMENTAL IMPACT
 =================================================================
@@ -185,7 +187,7 @@ Clean Energy Generation: ${structured_analysis.environmental_impact.clean_energy
 
 TECHNICAL RECOMMENDATIONS
 =================================================================
-${structured_analysis.technical_recommendations.map((rec, index) => `${index + 1}. ${rec}`).join('\n')}
+${structured_analysis.technical_recommendations ? structured_analysis.technical_recommendations.map((rec, index) => `${index + 1}. ${rec}`).join('\n') : unavailable}
 
 RECOMMENDED SOLAR VENDORS
 =================================================================
@@ -201,17 +203,17 @@ ${index + 1}. ${vendor.name}
 
 GOVERNMENT INCENTIVES
 =================================================================
-Central Subsidy: ${structured_analysis.government_incentives.central_subsidy}%
+${structured_analysis.government_incentives ? `Central Subsidy: ${structured_analysis.government_incentives.central_subsidy}%
 State Subsidy: ${structured_analysis.government_incentives.state_subsidy}%
 Net Metering: ${structured_analysis.government_incentives.net_metering_available ? 'Available' : 'Not Available'}
-Tax Benefits: ${structured_analysis.government_incentives.tax_benefits}
+Tax Benefits: ${structured_analysis.government_incentives.tax_benefits}` : unavailable}
 
 INSTALLATION TIMELINE
 =================================================================
-Site Survey: ${structured_analysis.installation_timeline.site_survey}
+${structured_analysis.installation_timeline ? `Site Survey: ${structured_analysis.installation_timeline.site_survey}
 Approvals: ${structured_analysis.installation_timeline.approvals}
 Installation: ${structured_analysis.installation_timeline.installation}
-Commissioning: ${structured_analysis.installation_timeline.commissioning}
+Commissioning: ${structured_analysis.installation_timeline.commissioning}` : unavailable}
 
 =================================================================
 This report was generated by SolarizeIt AI Analysis System
@@ -330,7 +332,7 @@ For more information, visit: www.solarize-it.com
             <CardContent className="p-6 text-center">
               <Leaf className="h-8 w-8 mx-auto mb-3" />
               <p className="text-3xl font-bold mb-1">
-                {structured_analysis.suitability_assessment.overall_score}%
+                {structured_analysis.suitability_assessment ? `${structured_analysis.suitability_assessment.overall_score}%` : 'N/A'}
               </p>
               <p className="text-green-100">Suitability Score</p>
             </CardContent>
@@ -427,12 +429,16 @@ For more information, visit: www.solarize-it.com
               <div>
                 <h3 className="font-semibold text-lg mb-3 text-emerald-600">Suitability Assessment</h3>
                 <div className="space-y-2">
-                  {structured_analysis.suitability_assessment.factors.map((factor, index) => (
-                    <div key={index} className="flex items-center gap-2">
-                      <div className="w-2 h-2 bg-emerald-500 rounded-full"></div>
-                      <span className="text-sm">{factor}</span>
-                    </div>
-                  ))}
+                  {structured_analysis.suitability_assessment ? (
+                    structured_analysis.suitability_assessment.factors.map((factor, index) => (
+                      <div key={index} className="flex items-center gap-2">
+                        <div className="w-2 h-2 bg-emerald-500 rounded-full"></div>
+                        <span className="text-sm">{factor}</span>
+                      </div>
+                    ))
+                  ) : (
+                    <p className="text-sm text-gray-500">Suitability assessment is not available for this analysis.</p>
+                  )}
                 </div>
               </div>
               
@@ -567,23 +573,25 @@ For more information, visit: www.solarize-it.com
         </Card>
 
         {/* Dynamic Next Steps from AI */}
-        <Card className="shadow-xl border-0 mb-8">
-          <CardHeader>
-            <CardTitle>AI-Recommended Next Steps</CardTitle>
-          </CardHeader>
-          <CardContent>
-            <div className="space-y-3">
-              {structured_analysis.technical_recommendations.map((recommendation, index) => (
-                <div key={index} className="flex items-center gap-3 p-3 bg-muted/50 rounded-lg">
-                  <div className="w-8 h-8 bg-emerald-100 text-emerald-600 rounded-full flex items-center justify-center text-sm font-medium flex-shrink-0">
-                    {index + 1}
+        {structured_analysis.technical_recommendations && (
+          <Card className="shadow-xl border-0 mb-8">
+            <CardHeader>
+              <CardTitle>AI-Recommended Next Steps</CardTitle>
+            </CardHeader>
+            <CardContent>
+              <div className="space-y-3">
+                {structured_analysis.technical_recommendations.map((recommendation, index) => (
+                  <div key={index} className="flex items-center gap-3 p-3 bg-muted/50 rounded-lg">
+                    <div className="w-8 h-8 bg-emerald-100 text-emerald-600 rounded-full flex items-center justify-center text-sm font-medium flex-shrink-0">
+                      {index + 1}
+                    </div>
+                    <span className="text-gray-700">{recommendation}</span>
                   </div>
-                  <span className="text-gray-700">{recommendation}</span>
-                </div>
-              ))}
-            </div>
-          </CardContent>
-        </Card>
+                ))}
+              </div>
+            </CardContent>
+          </Card>
+        )}
 
         {/* Government Incentives from AI */}
         {structured_analysis.government_incentives && (
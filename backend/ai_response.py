@@ -0,0 +1,309 @@
+"""
+Validation and repair of AI analysis responses
+
+The model is asked for one large JSON document. Instead of failing the whole
+analysis when that document is malformed or incomplete, we parse it
+tolerantly, validate it section by section and re-prompt only for the
+sections that are missing or broken, using a small token budget.
+"""
+
+import json
+import re
+import threading
+
+# Output token budget for each section when re-prompting
+SECTION_TOKEN_BUDGETS = {
+    'suitability_assessment': 250,
+    'financial_analysis': 150,
+    'technical_recommendations': 300,
+    'environmental_impact': 100,
+    'local_vendors': 700,
+    'government_incentives': 200,
+    'installation_timeline': 150
+}
+
+# Sections without which the analysis is not returned to the user
+REQUIRED_SECTIONS = ['local_vendors']
+
+_FENCE_PATTERN = re.compile(r'^```[a-zA-Z]*\s*|\s*```$')
+
+_stats_lock = threading.Lock()
+_stats = {
+    'responses': 0,
+    'parse_failures': 0,
+    'parse_repairs': 0,
+    'section_failures': 0,
+    'section_repairs': 0,
+    'repair_requests': 0,
+    'repair_parse_failures': 0,
+    'repair_parse_repairs': 0,
+    'cached_completions': 0,
+    'cached_parse_failures': 0,
+    'cached_parse_repairs': 0,
+    'sections_dropped': 0,
+    'unrecoverable': 0
+}
+
+
+def _record(counter, amount=1):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def get_stats():
+    """Return a snapshot of the validation/repair counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_text_list(value):
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(item, str) for item in value)
+
+
+def _has_fields(section, fields, check):
+    return isinstance(section, dict) and all(check(section.get(field)) for field in fields)
+
+
+def _valid_suitability(section):
+    return (
+        _has_fields(section, ['overall_score'], _is_number)
+        and _is_text_list(section.get('factors'))
+    )
+
+
+def _valid_financial(section):
+    return (
+        _has_fields(section, ['roi_percentage', 'total_savings_25_years'], _is_number)
+        and _has_fields(section, ['investment_grade'], lambda v: isinstance(v, str))
+        and (section.get('break_even_years') is None or _is_number(section['break_even_years']))
+    )
+
+
+def _valid_environmental(section):
+    return _has_fields(section, ['co2_reduction_tons', 'equivalent_trees', 'clean_energy_percentage'], _is_number)
+
+
+def _valid_vendors(section):
+    return (
+        isinstance(section, list)
+        and len(section) > 0
+        and all(
+            isinstance(v, dict) and isinstance(v.get('name'), str) and v['name']
+            and isinstance(v.get('certifications'), list)
+            for v in section
+        )
+    )
+
+
+def _valid_incentives(section):
+    return (
+        _has_fields(section, ['central_subsidy', 'state_subsidy'], _is_number)
+        and _has_fields(section, ['tax_benefits'], lambda v: isinstance(v, str))
+    )
+
+
+def _valid_timeline(section):
+    return _has_fields(
+        section,
+        ['site_survey', 'approvals', 'installation', 'commissioning'],
+        lambda v: isinstance(v, str)
+    )
+
+
+SECTION_VALIDATORS = {
+    'suitability_assessment': _valid_suitability,
+    'financial_analysis': _valid_financial,
+    'technical_recommendations': _is_text_list,
+    'environmental_impact': _valid_environmental,
+    'local_vendors': _valid_vendors,
+    'government_incentives': _valid_incentives,
+    'installation_timeline': _valid_timeline
+}
+
+
+def remove_trailing_commas(text):
+    """Drop commas directly before a closing bracket, leaving string contents untouched"""
+    result = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            following = index + 1
+            while following < len(text) and text[following].isspace():
+                following += 1
+            if following < len(text) and text[following] in '}]':
+                continue
+        result.append(char)
+    return ''.join(result)
+
+
+def strip_fences(text):
+    """Remove markdown code fences and fix trailing commas"""
+    return remove_trailing_commas(_FENCE_PATTERN.sub('', text.strip()))
+
+
+def extract_object(text):
+    """Cut away any prose surrounding the outermost JSON object"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    return text
+
+
+def salvage_sections(text):
+    """Recover whichever top-level sections still decode from broken JSON"""
+    decoder = json.JSONDecoder()
+    sections = {}
+    for name in SECTION_VALIDATORS:
+        match = re.search(r'"%s"\s*:\s*' % re.escape(name), text)
+        if not match:
+            continue
+        try:
+            value, _ = decoder.raw_decode(text, match.end())
+        except json.JSONDecodeError:
+            continue
+        sections[name] = value
+    return sections
+
+
+def parse_response(text, counter_prefix=''):
+    """
+    Parse a model response, tolerating fences, trailing commas and truncation.
+
+    Repair and cache-completion responses pass counter_prefix='repair_' or
+    'cached_' so they are counted separately from initial responses.
+    """
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    cleaned = strip_fences(text)
+    try:
+        parsed = json.loads(extract_object(cleaned))
+        if isinstance(parsed, dict):
+            _record(counter_prefix + 'parse_repairs')
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    _record(counter_prefix + 'parse_failures')
+    return salvage_sections(cleaned)
+
+
+def find_invalid_sections(analysis):
+    """Return the names of sections that are missing or fail validation"""
+    return [
+        name for name, validator in SECTION_VALIDATORS.items()
+        if not validator(analysis.get(name))
+    ]
+
+
+def build_repair_prompt(original_prompt, sections, previous_answer=True):
+    """Ask only for the listed sections of the original request"""
+    keys = ', '.join(f'"{name}"' for name in sections)
+    if previous_answer:
+        reason = f"Your previous answer was missing or had invalid values for: {keys}."
+    else:
+        reason = f"The other sections are already available; only {keys} are needed."
+    return f"""{original_prompt}
+
+        {reason}
+        Return ONLY a JSON object containing exactly these keys: {keys}.
+        Follow the structure given above for each key and use plain numbers for numeric fields.
+        """
+
+
+def validate_and_repair(text, original_prompt, complete):
+    """
+    Parse and validate a model response, re-prompting for broken sections.
+
+    `complete(prompt, max_tokens)` must return the raw text of a new completion.
+    Sections that are still invalid after repair are removed, so every
+    section returned has passed validation. Raises ValueError if a required
+    section is among them.
+    """
+    _record('responses')
+    analysis = parse_response(text)
+
+    invalid = find_invalid_sections(analysis)
+    if invalid:
+        _record('section_failures', len(invalid))
+        print(f"AI response invalid sections: {', '.join(invalid)}")
+
+        _record('repair_requests')
+        budget = sum(SECTION_TOKEN_BUDGETS[name] for name in invalid)
+        try:
+            repaired = parse_response(complete(build_repair_prompt(original_prompt, invalid), budget), 'repair_')
+        except Exception as e:
+            print(f"AI repair request failed: {e}")
+            repaired = {}
+
+        for name in invalid:
+            if SECTION_VALIDATORS[name](repaired.get(name)):
+                analysis[name] = repaired[name]
+                _record('section_repairs')
+
+    return _drop_invalid_sections(analysis)
+
+
+def complete_cached_analysis(analysis, original_prompt, complete):
+    """
+    Request only the sections a partial (cached) analysis is missing.
+
+    Uses the same small per-section token budgets as repairs, and the same
+    guarantee as validate_and_repair: invalid sections are dropped and a
+    missing required section raises ValueError.
+    """
+    _record('cached_completions')
+    analysis = dict(analysis)
+
+    missing = find_invalid_sections(analysis)
+    if missing:
+        budget = sum(SECTION_TOKEN_BUDGETS[name] for name in missing)
+        try:
+            response = parse_response(
+                complete(build_repair_prompt(original_prompt, missing, previous_answer=False), budget),
+                'cached_'
+            )
+        except Exception as e:
+            print(f"AI section request failed: {e}")
+            response = {}
+
+        for name in missing:
+            if SECTION_VALIDATORS[name](response.get(name)):
+                analysis[name] = response[name]
+
+    return _drop_invalid_sections(analysis)
+
+
+def _drop_invalid_sections(analysis):
+    invalid = find_invalid_sections(analysis)
+    # Never hand back a value that failed validation
+    analysis = {name: value for name, value in analysis.items() if name not in invalid}
+    dropped = [name for name in invalid if name not in REQUIRED_SECTIONS]
+    if dropped:
+        _record('sections_dropped', len(dropped))
+
+    missing_required = [name for name in REQUIRED_SECTIONS if name in invalid]
+    if missing_required:
+        _record('unrecoverable')
+        raise ValueError(f"AI failed to generate {', '.join(missing_required)}")
+
+    return analysis
@@ -0,0 +1,303 @@
+"""
+SQLite-backed cache for weather data and AI analyses
+
+Entries live in the main database so that every gunicorn worker and the
+prefill job (prefill.py) share them. Weather is keyed by a ~11 km grid cell;
+AI analyses additionally by monthly bill band, panel type and subsidy flag.
+
+Each prefill run is recorded in prefill_runs, and the hits on every entry it
+warmed are tracked in prefill_entries. Those rows outlive the cache entries
+themselves, so a run's hit rate can still be reported after its entries have
+expired, been purged or been replaced.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+DB_PATH = 'solar_analysis.db'
+
+# Grid cell size in degrees (0.1° is roughly 11 km)
+GRID_PRECISION = 1
+
+# (low, high) monthly bill ranges in INR; the last band is open-ended
+BILL_BANDS = [
+    (0, 1500),
+    (1500, 3000),
+    (3000, 5000),
+    (5000, 8000),
+    (8000, 12000),
+    (12000, 20000),
+    (20000, None)
+]
+
+# Number of prefill runs whose per-entry hit counts are kept
+PREFILL_RUN_HISTORY = 30
+
+# Seconds a lookup waits for a locked database before skipping the hit count
+HIT_COUNT_TIMEOUT = 0.05
+
+_stats_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'prefilled_hits': 0,
+    'misses': 0,
+    'errors': 0
+}
+
+
+def _record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def init_cache_table(db_path=DB_PATH):
+    """Create the cache and prefill tracking tables if they don't exist"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            cache_key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            prefill_run_id INTEGER,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prefill_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prefill_entries (
+            run_id INTEGER NOT NULL,
+            cache_key TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (run_id, cache_key),
+            FOREIGN KEY (run_id) REFERENCES prefill_runs (id)
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def grid_cell(lat, lon):
+    """Snap coordinates to the centre of their grid cell"""
+    return round(float(lat), GRID_PRECISION), round(float(lon), GRID_PRECISION)
+
+
+def bill_band(monthly_bill):
+    """Return the index of the bill band containing monthly_bill"""
+    for index, (low, high) in enumerate(BILL_BANDS):
+        if high is None or monthly_bill < high:
+            return index
+    return len(BILL_BANDS) - 1
+
+
+def representative_bill(band):
+    """Typical monthly bill used when generating an analysis for a band"""
+    low, high = BILL_BANDS[band]
+    if high is None:
+        return low * 1.25
+    return (low + high) / 2
+
+
+def weather_key(lat, lon):
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    return f"weather:{cell_lat:.{GRID_PRECISION}f}:{cell_lon:.{GRID_PRECISION}f}"
+
+
+def analysis_key(lat, lon, monthly_bill, panel_type, include_subsidy):
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    return (
+        f"ai:{cell_lat:.{GRID_PRECISION}f}:{cell_lon:.{GRID_PRECISION}f}"
+        f":{bill_band(monthly_bill)}:{panel_type}:{int(bool(include_subsidy))}"
+    )
+
+
+def get(key, db_path=DB_PATH):
+    """
+    Return the cached value for key, or None if missing or expired
+
+    Database errors are logged and treated as a miss. Hit counting is best
+    effort: if the database is busy the value is still returned uncounted.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT value, prefill_run_id FROM cache_entries
+                WHERE cache_key = ? AND expires_at > ?
+            ''', (key, time.time()))
+            result = cursor.fetchone()
+        finally:
+            conn.close()
+        value = json.loads(result[0]) if result else None
+    except (sqlite3.Error, ValueError) as e:
+        print(f"✗ Cache lookup error for {key}: {e}")
+        _record('errors')
+        _record('misses')
+        return None
+
+    if not result:
+        _record('misses')
+        return None
+
+    _record('hits')
+    if result[1] is not None:
+        _record('prefilled_hits')
+    _count_hit(key, result[1], db_path)
+    return value
+
+
+def _count_hit(key, prefill_run_id, db_path):
+    try:
+        conn = sqlite3.connect(db_path, timeout=HIT_COUNT_TIMEOUT)
+        try:
+            conn.execute('UPDATE cache_entries SET hits = hits + 1 WHERE cache_key = ?', (key,))
+            if prefill_run_id is not None:
+                conn.execute('''
+                    UPDATE prefill_entries SET hits = hits + 1
+                    WHERE run_id = ? AND cache_key = ?
+                ''', (prefill_run_id, key))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"✗ Cache hit count skipped for {key}: {e}")
+        _record('errors')
+
+
+def put(key, value, ttl_seconds, prefill_run_id=None, db_path=DB_PATH):
+    """Store value under key for ttl_seconds (no-op when ttl_seconds <= 0 or on database errors)"""
+    if ttl_seconds <= 0:
+        return
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO cache_entries (cache_key, value, expires_at, prefill_run_id, hits)
+                VALUES (?, ?, ?, ?, 0)
+            ''', (key, json.dumps(value), time.time() + ttl_seconds, prefill_run_id))
+            if prefill_run_id is not None:
+                conn.execute('''
+                    INSERT OR REPLACE INTO prefill_entries (run_id, cache_key, hits)
+                    VALUES (?, ?, 0)
+                ''', (prefill_run_id, key))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"✗ Cache write error for {key}: {e}")
+        _record('errors')
+
+
+def start_prefill_run(db_path=DB_PATH):
+    """Record a new prefill run, dropping the oldest beyond PREFILL_RUN_HISTORY"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO prefill_runs DEFAULT VALUES')
+        run_id = cursor.lastrowid
+        cursor.execute('''
+            DELETE FROM prefill_entries WHERE run_id IN (
+                SELECT id FROM prefill_runs ORDER BY id DESC LIMIT -1 OFFSET ?
+            )
+        ''', (PREFILL_RUN_HISTORY,))
+        cursor.execute('''
+            DELETE FROM prefill_runs WHERE id IN (
+                SELECT id FROM prefill_runs ORDER BY id DESC LIMIT -1 OFFSET ?
+            )
+        ''', (PREFILL_RUN_HISTORY,))
+        conn.commit()
+        return run_id
+    finally:
+        conn.close()
+
+
+def purge_expired(db_path=DB_PATH):
+    """Delete expired entries and return how many were removed"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def get_prefill_runs(limit=5, db_path=DB_PATH):
+    """Per-run prefill utilisation, newest first, split by weather/AI entries"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT
+                r.id,
+                r.started_at,
+                SUBSTR(e.cache_key, 1, INSTR(e.cache_key, ':') - 1) AS kind,
+                COUNT(e.cache_key),
+                COALESCE(SUM(CASE WHEN e.hits > 0 THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(e.hits), 0)
+            FROM (SELECT * FROM prefill_runs ORDER BY id DESC LIMIT ?) r
+            LEFT JOIN prefill_entries e ON e.run_id = r.id
+            GROUP BY r.id, kind
+            ORDER BY r.id DESC
+        ''', (limit,))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    runs = {}
+    for run_id, started_at, kind, entries, used, hits in rows:
+        run = runs.setdefault(run_id, {
+            'run_id': run_id,
+            'started_at': started_at,
+            'entries': 0,
+            'entries_used': 0,
+            'hits': 0,
+            'by_kind': {}
+        })
+        if not entries:
+            continue
+        run['entries'] += entries
+        run['entries_used'] += used
+        run['hits'] += hits
+        run['by_kind'][kind] = {'entries': entries, 'entries_used': used, 'hits': hits}
+
+    for run in runs.values():
+        run['hit_rate'] = round(run['entries_used'] / run['entries'], 3) if run['entries'] else None
+    return list(runs.values())
+
+
+def get_stats(db_path=DB_PATH):
+    """Lookup counters for this process, live entries and recent prefill runs"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(hits), 0)
+            FROM cache_entries
+            WHERE expires_at > ?
+        ''', (time.time(),))
+        entries, total_hits = cursor.fetchone()
+    finally:
+        conn.close()
+
+    with _stats_lock:
+        lookups = dict(_stats)
+    total_lookups = lookups['hits'] + lookups['misses']
+
+    return {
+        'entries': entries,
+        'total_hits': total_hits,
+        'process_lookups': lookups,
+        'process_hit_rate': round(lookups['hits'] / total_lookups, 3) if total_lookups else None,
+        'prefill_runs': get_prefill_runs(db_path=db_path)
+    }
@@ -0,0 +1,123 @@
+"""
+Location detection and bill-independent analysis sections
+
+Helpers shared by app.py and prefill.py for deciding what part of an AI
+analysis may be reused across requests. Only sections that don't depend on
+the requester's bill are cached; the financial and environmental sections are
+recomputed from each request's solar metrics, and the remaining narrative
+sections are generated for the request itself.
+"""
+
+import copy
+
+# (keyword, city, state) checked in order; the first match wins
+LOCATION_KEYWORDS = [
+    ("mumbai", "Mumbai", "Maharashtra"),
+    ("pune", "Pune", "Maharashtra"),
+    ("maharashtra", None, "Maharashtra"),
+    ("bangalore", "Bangalore", "Karnataka"),
+    ("bengaluru", "Bangalore", "Karnataka"),
+    ("karnataka", None, "Karnataka"),
+    ("chennai", "Chennai", "Tamil Nadu"),
+    ("tamil nadu", None, "Tamil Nadu"),
+    ("delhi", "Delhi", "Delhi"),
+    ("hyderabad", "Hyderabad", "Telangana"),
+    ("telangana", None, "Telangana"),
+    ("ahmedabad", "Ahmedabad", "Gujarat"),
+    ("gujarat", None, "Gujarat")
+]
+
+# Vendor quote ranges as multiples of the estimated cost, in prompt order
+VENDOR_QUOTE_RANGES = [(0.9, 1.1), (1.05, 1.15), (0.95, 1.05)]
+
+# Sections whose content doesn't depend on the bill, once quotes and the
+# central subsidy are taken out
+CACHED_SECTIONS = ('local_vendors', 'government_incentives')
+
+
+def detect_location(address):
+    """Detect (city, state) from an address using the known metro keywords"""
+    address_lower = address.lower()
+    for keyword, city, state in LOCATION_KEYWORDS:
+        if keyword in address_lower:
+            return city, state
+    return None, "India"
+
+
+def is_known_location(address):
+    """True if the address matches one of the known metros/states"""
+    return detect_location(address)[1] != "India"
+
+
+def location_label(address):
+    """City/state description of an address that never includes the street"""
+    city, state = detect_location(address)
+    if city and city != state:
+        return f"{city}, {state}, India"
+    if state != "India":
+        return f"{state}, India"
+    return "India"
+
+
+def vendor_quote(estimated_cost, index):
+    low, high = VENDOR_QUOTE_RANGES[index % len(VENDOR_QUOTE_RANGES)]
+    return f"₹{round(estimated_cost/100000*low, 1)}-{round(estimated_cost/100000*high, 1)} lakhs"
+
+
+def computed_analysis_sections(energy_data, solar_metrics, weather_data):
+    """
+    Financial and environmental sections, derived directly from this request's numbers
+
+    These use the same formulas the prompt asks the model to apply, so they are
+    the only sections filled in when the model's version fails validation.
+    """
+    payback = solar_metrics['payback_period_years']
+    if payback is not None and payback < 7:
+        investment_grade = "Excellent"
+    elif payback is not None and payback < 12:
+        investment_grade = "Good"
+    elif payback is not None and payback < 18:
+        investment_grade = "Moderate"
+    else:
+        investment_grade = "Low"
+
+    roi = solar_metrics['annual_savings'] / solar_metrics['estimated_cost'] * 100 if solar_metrics['estimated_cost'] else 0
+
+    return {
+        'financial_analysis': {
+            'roi_percentage': round(roi, 1),
+            'break_even_years': payback,
+            'total_savings_25_years': round(solar_metrics['annual_savings'] * 25 - solar_metrics['estimated_cost']),
+            'investment_grade': investment_grade
+        },
+        'environmental_impact': {
+            'co2_reduction_tons': round(solar_metrics['co2_reduction_kg_per_year'] / 1000, 2),
+            'equivalent_trees': round(solar_metrics['co2_reduction_kg_per_year'] / 21.77),
+            'clean_energy_percentage': min(95, round(75 + (weather_data['average_sun_hours'] - 4) * 3, 1))
+        }
+    }
+
+
+def cacheable_narrative(ai_analysis):
+    """The bill-independent sections of an analysis, for sharing via the cache"""
+    narrative = {name: copy.deepcopy(ai_analysis[name]) for name in CACHED_SECTIONS if name in ai_analysis}
+    for vendor in narrative.get('local_vendors', []):
+        vendor.pop('estimated_quote', None)
+    narrative.get('government_incentives', {}).pop('central_subsidy', None)
+    return narrative
+
+
+def prepare_cached_analysis(narrative, energy_data, solar_metrics, weather_data):
+    """
+    Combine a cached narrative with this request's own numbers.
+
+    Sections that depend on the bill but can't be computed (suitability,
+    recommendations, timeline) are left out, to be generated for this request.
+    """
+    analysis = copy.deepcopy(narrative)
+    for index, vendor in enumerate(analysis.get('local_vendors', [])):
+        vendor['estimated_quote'] = vendor_quote(solar_metrics['estimated_cost'], index)
+    if 'government_incentives' in analysis:
+        analysis['government_incentives']['central_subsidy'] = 30 if energy_data['include_subsidy'] else 0
+    analysis.update(computed_analysis_sections(energy_data, solar_metrics, weather_data))
+    return analysis
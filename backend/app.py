@@ -8,6 +8,22 @@ import requests
 import math
 from dotenv import load_dotenv
 from openai import OpenAI
+from ai_response import (
+    complete_cached_analysis,
+    find_invalid_sections,
+    validate_and_repair,
+    get_stats as get_ai_response_stats
+)
+import analysis_cache
+from analysis_sections import (
+    cacheable_narrative,
+    computed_analysis_sections,
+    detect_location,
+    is_known_location,
+    location_label,
+    prepare_cached_analysis,
+    vendor_quote
+)
 
 app = Flask(__name__)
 CORS(
@@ -26,6 +42,10 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
 
+# Cache lifetimes in seconds (0 disables caching)
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL_SECONDS', 3 * 3600))
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL_SECONDS', 24 * 3600))
+
 # Initialize OpenAI client for Azure
 client = OpenAI(
     base_url=AZURE_OPENAI_ENDPOINT,
@@ -65,6 +85,8 @@ def init_database():
     
     conn.commit()
     conn.close()
+    
+    analysis_cache.init_cache_table()
 
 # Initialize database when app starts
 init_database()
@@ -98,6 +120,16 @@ def get_weather_data(lat, lon):
         print(f"Weather API error: {e}")
         raise Exception(f"Unable to fetch weather data: {str(e)}")
 
+def get_cached_weather_data(lat, lon):
+    """Get weather data for the grid cell, fetching it only on a cache miss"""
+    key = analysis_cache.weather_key(lat, lon)
+    weather_data = analysis_cache.get(key)
+    if weather_data is None:
+        cell_lat, cell_lon = analysis_cache.grid_cell(lat, lon)
+        weather_data = get_weather_data(cell_lat, cell_lon)
+        analysis_cache.put(key, weather_data, WEATHER_CACHE_TTL)
+    return weather_data
+
 def calculate_solar_metrics(lat, lon, monthly_bill, roof_size, panel_type, weather_data):
     """Calculate solar metrics using actual weather data"""
     try:
@@ -152,24 +184,17 @@ def calculate_solar_metrics(lat, lon, monthly_bill, roof_size, panel_type, weath
         print(f"Calculation error: {e}")
         raise Exception(f"Failed to calculate solar metrics: {str(e)}")
 
-def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data):
-    """Use Azure OpenAI to provide completely dynamic analysis with NO fallback data"""
+def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data, before_request=None, cached_sections=None):
+    """
+    Use Azure OpenAI to provide completely dynamic analysis with NO fallback data
+    
+    before_request, if given, is called before every completion (including repairs),
+    e.g. to apply a rate limit. With cached_sections (a partial analysis from the
+    cache), only the sections it lacks are requested, with a small token budget.
+    """
     try:
         # Extract state/region from address for location-specific data
-        address_lower = location_data['address'].lower()
-        detected_state = "India"
-        if "mumbai" in address_lower or "pune" in address_lower or "maharashtra" in address_lower:
-            detected_state = "Maharashtra"
-        elif "bangalore" in address_lower or "bengaluru" in address_lower or "karnataka" in address_lower:
-            detected_state = "Karnataka"
-        elif "chennai" in address_lower or "tamil nadu" in address_lower:
-            detected_state = "Tamil Nadu"
-        elif "delhi" in address_lower or "new delhi" in address_lower:
-            detected_state = "Delhi"
-        elif "hyderabad" in address_lower or "telangana" in address_lower:
-            detected_state = "Telangana"
-        elif "ahmedabad" in address_lower or "gujarat" in address_lower:
-            detected_state = "Gujarat"
+        detected_state = detect_location(location_data['address'])[1]
         
         # Create completely dynamic prompt
         prompt = f"""
@@ -229,7 +254,7 @@ def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data)
                     "experience_years": [Random 5-15], 
                     "specialization": "[Unique: Residential Solar/Commercial/Premium/Rooftop etc]",
                     "contact": "+91-[Generate different 10-digit number each time]",
-                    "estimated_quote": "₹{round(solar_metrics['estimated_cost']/100000*0.9, 1)}-{round(solar_metrics['estimated_cost']/100000*1.1, 1)} lakhs",
+                    "estimated_quote": "{vendor_quote(solar_metrics['estimated_cost'], 0)}",
                     "certifications": ["MNRE Approved", "[Add 1-2 {detected_state}-specific certs]"]
                 }},
                 {{
@@ -238,7 +263,7 @@ def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data)
                     "experience_years": [Different years 6-20],
                     "specialization": "[Different specialization]", 
                     "contact": "+91-[DIFFERENT 10-digit number]",
-                    "estimated_quote": "₹{round(solar_metrics['estimated_cost']/100000*1.05, 1)}-{round(solar_metrics['estimated_cost']/100000*1.15, 1)} lakhs",
+                    "estimated_quote": "{vendor_quote(solar_metrics['estimated_cost'], 1)}",
                     "certifications": ["MNRE Approved", "[Different certifications]"]
                 }},
                 {{
@@ -247,7 +272,7 @@ def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data)
                     "experience_years": [Third years 8-25],
                     "specialization": "[Third specialization type]",
                     "contact": "+91-[THIRD different 10-digit number]",
-                    "estimated_quote": "₹{round(solar_metrics['estimated_cost']/100000*0.95, 1)}-{round(solar_metrics['estimated_cost']/100000*1.05, 1)} lakhs",
+                    "estimated_quote": "{vendor_quote(solar_metrics['estimated_cost'], 2)}",
                     "certifications": ["MNRE Approved", "[Third set of certs]"]
                 }}
             ],
@@ -268,34 +293,35 @@ def analyze_with_openai(location_data, energy_data, solar_metrics, weather_data)
         CRITICAL: Make vendor names sound realistic for {detected_state}. Generate different phone numbers. All values must be unique for this analysis.
         """
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a solar expert for {detected_state}. Generate realistic, unique data for each analysis. Return ONLY valid JSON with no markdown formatting."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            max_tokens=3000,
-            temperature=0.9  # High temperature for maximum variation
-        )
-        
-        ai_response = response.choices[0].message.content.strip()
-        
-        # Clean response
-        if ai_response.startswith('```'):
-            lines = ai_response.split('\n')
-            ai_response = '\n'.join(lines[1:-1])
-        
-        structured_analysis = json.loads(ai_response)
-        
-        # Validate that we have vendors (required)
-        if not structured_analysis.get('local_vendors') or len(structured_analysis['local_vendors']) == 0:
-            raise ValueError("AI failed to generate vendors")
+        system_message = f"You are a solar expert for {detected_state}. Generate realistic, unique data for each analysis. Return ONLY valid JSON with no markdown formatting."
+
+        def complete(content, max_tokens):
+            if before_request:
+                before_request()
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_message
+                    },
+                    {
+                        "role": "user", 
+                        "content": content
+                    }
+                ],
+                max_tokens=max_tokens,
+                temperature=0.9  # High temperature for maximum variation
+            )
+            return response.choices[0].message.content.strip()
+        
+        if cached_sections is not None:
+            return complete_cached_analysis(cached_sections, prompt, complete)
+        
+        ai_response = complete(prompt, 3000)
+        
+        # Tolerant parsing plus targeted re-prompts for missing/broken sections
+        structured_analysis = validate_and_repair(ai_response, prompt, complete)
         
         return structured_analysis
         
@@ -338,8 +364,8 @@ def analyze_solar():
             'include_subsidy': bool(data['includeSubsidy'])
         }
         
-        # Get actual weather data
-        weather_data = get_weather_data(location_data['latitude'], location_data['longitude'])
+        # Get actual weather data (shared per grid cell)
+        weather_data = get_cached_weather_data(location_data['latitude'], location_data['longitude'])
         
         # Calculate solar metrics using real data
         solar_metrics = calculate_solar_metrics(
@@ -351,8 +377,44 @@ def analyze_solar():
             weather_data
         )
         
-        # Get ONLY AI analysis - no fallbacks
-        ai_analysis = analyze_with_openai(location_data, energy_data, solar_metrics, weather_data)
+        # Get ONLY AI analysis - no invented fallbacks (reused per grid cell and bill band)
+        ai_cache_key = analysis_cache.analysis_key(
+            location_data['latitude'],
+            location_data['longitude'],
+            energy_data['monthly_bill'],
+            energy_data['panel_type'],
+            energy_data['include_subsidy']
+        )
+        # Only metro locations are shared through the cache; those prompts name just the
+        # city/state and grid cell, never the user's address
+        cacheable = AI_CACHE_TTL > 0 and is_known_location(location_data['address'])
+        prompt_location = location_data
+        cached_narrative = None
+        if cacheable:
+            cell_lat, cell_lon = analysis_cache.grid_cell(location_data['latitude'], location_data['longitude'])
+            prompt_location = {
+                'address': location_label(location_data['address']),
+                'latitude': cell_lat,
+                'longitude': cell_lon
+            }
+            cached_narrative = analysis_cache.get(ai_cache_key)
+        
+        if cached_narrative is not None:
+            # The cache holds only bill-independent sections (vendors, incentives); numbers are
+            # computed for this request and the remaining sections generated for it
+            ai_analysis = analyze_with_openai(
+                prompt_location, energy_data, solar_metrics, weather_data,
+                cached_sections=prepare_cached_analysis(cached_narrative, energy_data, solar_metrics, weather_data)
+            )
+        else:
+            ai_analysis = analyze_with_openai(prompt_location, energy_data, solar_metrics, weather_data)
+            if cacheable and not find_invalid_sections(ai_analysis):
+                analysis_cache.put(ai_cache_key, cacheable_narrative(ai_analysis), AI_CACHE_TTL)
+        
+        # Computable sections dropped during validation are filled from solar_metrics;
+        # other failed sections stay absent and the results page shows them as unavailable
+        for name, section in computed_analysis_sections(energy_data, solar_metrics, weather_data).items():
+            ai_analysis.setdefault(name, section)
         
         # Store analysis in database
         conn = sqlite3.connect('solar_analysis.db')
@@ -430,7 +492,7 @@ def analyze_solar():
             },
             'recommendations': {
                 'is_suitable': ai_analysis.get('suitability_assessment', {}).get('overall_score', 0) > 70,
-                'confidence_score': ai_analysis.get('suitability_assessment', {}).get('overall_score', 75),
+                'confidence_score': ai_analysis.get('suitability_assessment', {}).get('overall_score'),
                 'priority_actions': ai_analysis.get('technical_recommendations', [])
             }
         }
@@ -516,7 +578,9 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'openai_api_configured': bool(OPENAI_API_KEY),
         'weather_api_configured': bool(OPENWEATHER_API_KEY),
-        'azure_endpoint_configured': bool(AZURE_OPENAI_ENDPOINT)
+        'azure_endpoint_configured': bool(AZURE_OPENAI_ENDPOINT),
+        'ai_response_stats': get_ai_response_stats(),
+        'cache_stats': analysis_cache.get_stats()
     })
 
 @app.route('/api/subsidy-info/<state>', methods=['GET'])
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Bulk ingest, export and maintenance tooling for the Solar Analysis database
+
+Usage:
+    python db_tools.py load analyses.jsonl
+    python db_tools.py load analyses.csv --batch-size 10000
+    python db_tools.py load analyses.jsonl --skip 250000
+    python db_tools.py export analyses.jsonl
+    python db_tools.py export analyses.parquet
+    python db_tools.py maintain
+
+Records are read and written in fixed-size batches so memory stays flat
+regardless of how many rows are processed. Each load batch is committed on
+its own so the live app isn't locked out of the database for the whole
+backfill; after a failure, rerun with --skip set to the reported number of
+committed records. Use --single-transaction for an all-or-nothing load.
+
+Parquet export is an optional extra and needs pyarrow, which is not part of
+requirements.txt:
+    pip install pyarrow
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+DB_PATH = 'solar_analysis.db'
+DEFAULT_BATCH_SIZE = 5000
+
+# Columns accepted on load; a missing id is auto-assigned and a missing
+# created_at defaults to the load time
+ANALYSIS_COLUMNS = [
+    'id',
+    'user_id',
+    'address',
+    'latitude',
+    'longitude',
+    'monthly_bill',
+    'roof_size',
+    'panel_type',
+    'include_subsidy',
+    'analysis_result',
+    'created_at'
+]
+
+REQUIRED_COLUMNS = ['address', 'latitude', 'longitude', 'monthly_bill', 'panel_type', 'include_subsidy']
+
+SUPPORTED_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def ensure_schema(conn):
+    """Create the users/analyses tables if they don't exist yet"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            address TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            monthly_bill REAL NOT NULL,
+            roof_size TEXT,
+            panel_type TEXT NOT NULL,
+            include_subsidy BOOLEAN NOT NULL,
+            analysis_result TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.commit()
+
+
+def detect_format(path, fmt=None):
+    """Work out the file format from an explicit flag or the file extension"""
+    if fmt:
+        fmt = fmt.lower()
+    else:
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt == 'json':
+            fmt = 'jsonl'
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(SUPPORTED_FORMATS)}")
+    return fmt
+
+
+def iter_jsonl(path):
+    """Yield one record per non-blank line of a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+
+def iter_csv(path):
+    """Yield one record per CSV row, keyed by the header"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+def parse_timestamp(value):
+    """Normalise created_at to SQLite's 'YYYY-MM-DD HH:MM:SS' text (UTC for epoch numbers)"""
+    if isinstance(value, bool):
+        raise ValueError("created_at must be a timestamp string or epoch seconds")
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str):
+        return value
+    raise ValueError("created_at must be a timestamp string or epoch seconds")
+
+
+def parse_bool(value):
+    """Interpret booleans coming from JSON or CSV text"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 't')
+    return bool(value)
+
+
+# Every load inserts the full column set so no field is ever dropped
+INSERT_STATEMENT = f'''
+    INSERT INTO analyses ({', '.join(ANALYSIS_COLUMNS)})
+    VALUES ({', '.join('COALESCE(?, CURRENT_TIMESTAMP)' if c == 'created_at' else '?' for c in ANALYSIS_COLUMNS)})
+'''
+
+
+def record_to_row(record, columns=ANALYSIS_COLUMNS):
+    """Convert an input record to a parameter tuple matching columns"""
+    unknown = [key for key in record if key not in columns]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+    for field in REQUIRED_COLUMNS:
+        if record.get(field) in (None, ''):
+            raise ValueError(f"Missing required field: {field}")
+
+    row = []
+    for column in columns:
+        value = record.get(column)
+        if value == '':
+            value = None
+        if value is None:
+            row.append(None)
+        elif column in ('latitude', 'longitude', 'monthly_bill'):
+            row.append(float(value))
+        elif column in ('id', 'user_id'):
+            row.append(int(value))
+        elif column == 'include_subsidy':
+            row.append(parse_bool(value))
+        elif column == 'analysis_result' and not isinstance(value, str):
+            row.append(json.dumps(value))
+        elif column == 'created_at':
+            row.append(parse_timestamp(value))
+        elif isinstance(value, (dict, list, bool)):
+            raise ValueError(f"{column} must be text")
+        else:
+            # address, roof_size, panel_type are TEXT columns
+            row.append(str(value))
+    return tuple(row)
+
+
+def bulk_load(path, db_path=DB_PATH, fmt=None, batch_size=DEFAULT_BATCH_SIZE, skip=0, single_transaction=False):
+    """
+    Load analyses from a JSONL/CSV file with one executemany per batch.
+
+    Each batch is committed as its own transaction unless single_transaction
+    is set. The first `skip` records are ignored, which resumes a failed load.
+    Returns the number of rows inserted.
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == 'jsonl':
+        records = iter_jsonl(path)
+    elif fmt == 'csv':
+        records = iter_csv(path)
+    else:
+        raise ValueError("Loading is only supported for jsonl and csv files")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    ensure_schema(conn)
+    cursor = conn.cursor()
+
+    batch = []
+    total = 0
+    # Number of records (counting skipped ones) known to be committed
+    committed = skip
+
+    def flush(record_number):
+        nonlocal batch, total, committed
+        if not single_transaction:
+            cursor.execute('BEGIN')
+        cursor.executemany(INSERT_STATEMENT, batch)
+        if not single_transaction:
+            cursor.execute('COMMIT')
+            committed = record_number
+        total += len(batch)
+        batch = []
+
+    record_number = skip
+    try:
+        if single_transaction:
+            cursor.execute('BEGIN')
+        for record_number, record in enumerate(records, 1):
+            if record_number <= skip:
+                continue
+            try:
+                batch.append(record_to_row(record))
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Record {record_number}: {e}")
+
+            if len(batch) >= batch_size:
+                flush(record_number)
+                print(f"  ... {total} rows loaded")
+
+        if batch:
+            flush(record_number)
+        if single_transaction:
+            cursor.execute('COMMIT')
+            committed = record_number
+    except Exception as e:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise RuntimeError(
+            f"{e} ({committed} records committed; rerun with --skip {committed} to resume)"
+        ) from e
+    finally:
+        conn.close()
+
+    return total
+
+
+def iter_analysis_batches(conn, batch_size):
+    """Stream the analyses table in id order, one batch at a time"""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(ANALYSIS_COLUMNS)} FROM analyses ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def write_jsonl(conn, path, batch_size):
+    total = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for rows in iter_analysis_batches(conn, batch_size):
+            for row in rows:
+                record = dict(zip(ANALYSIS_COLUMNS, row))
+                record['include_subsidy'] = bool(record['include_subsidy'])
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            total += len(rows)
+    return total
+
+
+def write_csv(conn, path, batch_size):
+    total = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ANALYSIS_COLUMNS)
+        for rows in iter_analysis_batches(conn, batch_size):
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+
+def write_parquet(conn, path, batch_size):
+    """Write one Parquet row group per batch (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow. Install it with: pip install pyarrow")
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('address', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('monthly_bill', pa.float64()),
+        ('roof_size', pa.string()),
+        ('panel_type', pa.string()),
+        ('include_subsidy', pa.bool_()),
+        ('analysis_result', pa.string()),
+        ('created_at', pa.string())
+    ])
+
+    total = 0
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        for rows in iter_analysis_batches(conn, batch_size):
+            columns = [list(column) for column in zip(*rows)]
+            subsidy_index = ANALYSIS_COLUMNS.index('include_subsidy')
+            columns[subsidy_index] = [None if v is None else bool(v) for v in columns[subsidy_index]]
+            for index, field in enumerate(schema):
+                if field.type == pa.string():
+                    # Rows loaded by older tools may hold numbers in TEXT columns
+                    columns[index] = [None if v is None else str(v) for v in columns[index]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            total += len(rows)
+    finally:
+        writer.close()
+    return total
+
+
+def export_analyses(path, db_path=DB_PATH, fmt=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream the analyses table to a JSONL, CSV or Parquet file"""
+    fmt = detect_format(path, fmt)
+    writers = {
+        'jsonl': write_jsonl,
+        'csv': write_csv,
+        'parquet': write_parquet
+    }
+
+    conn = sqlite3.connect(db_path)
+    try:
+        return writers[fmt](conn, path, batch_size)
+    finally:
+        conn.close()
+
+
+def run_maintenance(db_path=DB_PATH):
+    """Reclaim free pages and refresh query planner statistics"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        size_before = os.path.getsize(db_path)
+        conn.execute('VACUUM')
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
+        size_after = os.path.getsize(db_path)
+    finally:
+        conn.close()
+    return size_before, size_after
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Solar Analysis database tools')
+    parser.add_argument('--db', default=DB_PATH, help=f'SQLite database path (default: {DB_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='Bulk load analyses from JSONL or CSV')
+    load_parser.add_argument('path')
+    load_parser.add_argument('--format', choices=['jsonl', 'csv'])
+    load_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    load_parser.add_argument('--skip', type=int, default=0, help='Skip the first N records (to resume a failed load)')
+    load_parser.add_argument('--single-transaction', action='store_true', help='Load all-or-nothing in one transaction')
+
+    export_parser = subparsers.add_parser('export', help='Export analyses to JSONL, CSV or Parquet')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=list(SUPPORTED_FORMATS))
+    export_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    subparsers.add_parser('maintain', help='Run VACUUM and ANALYZE on the database')
+
+    return parser
+
+
+def main(argv=None):
+    """Main CLI entry point"""
+    args = build_parser().parse_args(argv)
+
+    if getattr(args, 'batch_size', 1) < 1:
+        print("✗ --batch-size must be at least 1")
+        return 1
+
+    try:
+        if args.command == 'load':
+            total = bulk_load(
+                args.path, args.db, args.format, args.batch_size, args.skip, args.single_transaction
+            )
+            print(f"✓ Loaded {total} analyses into {args.db}")
+        elif args.command == 'export':
+            total = export_analyses(args.path, args.db, args.format, args.batch_size)
+            print(f"✓ Exported {total} analyses to {args.path}")
+        elif args.command == 'maintain':
+            size_before, size_after = run_maintenance(args.db)
+            print(f"✓ Maintenance complete: {size_before} -> {size_after} bytes")
+    except Exception as e:
+        print(f"✗ {args.command.capitalize()} failed: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
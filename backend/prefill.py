@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Cache prefill job for the busiest city grid cells
+
+Warms weather data and representative AI analyses for the top-N grid cells
+and the most common bill/panel profiles so the first requests of the day
+don't pay the full upstream cost.
+
+Usage:
+    python prefill.py run --cities 20 --profiles 4 --rate 30
+    python prefill.py schedule --at 05:30
+    python prefill.py report
+
+Upstream calls (weather and every AI completion, including repairs) are
+spaced to stay under --rate per minute. Prompts only ever name a city/state,
+never a user's street address, and only known metros are warmed. `report`
+only reads the database, so it doesn't need the API credentials.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import analysis_cache
+from ai_response import find_invalid_sections
+from analysis_sections import cacheable_narrative, is_known_location, location_label
+
+DEFAULT_CITIES = int(os.getenv('PREFILL_CITIES', 20))
+DEFAULT_PROFILES = int(os.getenv('PREFILL_PROFILES', 4))
+DEFAULT_RATE_PER_MINUTE = float(os.getenv('PREFILL_RATE_PER_MINUTE', 30))
+
+# Metros used when there isn't enough analysis history yet
+SEED_CITIES = [
+    ('Mumbai, Maharashtra, India', 19.0760, 72.8777),
+    ('Delhi, India', 28.6139, 77.2090),
+    ('Bangalore, Karnataka, India', 12.9716, 77.5946),
+    ('Hyderabad, Telangana, India', 17.3850, 78.4867),
+    ('Chennai, Tamil Nadu, India', 13.0827, 80.2707),
+    ('Pune, Maharashtra, India', 18.5204, 73.8567),
+    ('Ahmedabad, Gujarat, India', 23.0225, 72.5714)
+]
+
+# (bill band, panel type, include subsidy) used when there is no history
+DEFAULT_PROFILES_LIST = [
+    (2, 'standard', True),
+    (3, 'standard', True),
+    (1, 'standard', True),
+    (3, 'premium', True)
+]
+
+# How many recent analyses to sample when picking common profiles
+PROFILE_SAMPLE_SIZE = 10000
+
+
+class RateLimiter:
+    """Space out calls so at most `per_minute` happen each minute"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self.last_call = 0.0
+
+    def wait(self):
+        delay = self.last_call + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_call = time.monotonic()
+
+
+def top_locations(limit, db_path=analysis_cache.DB_PATH):
+    """Most requested grid cells as (label, lat, lon), topped up with the seed metros"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.address, a.latitude, a.longitude
+            FROM analyses a
+            JOIN (
+                SELECT MAX(id) AS last_id, COUNT(*) AS requests
+                FROM analyses
+                GROUP BY ROUND(latitude, ?), ROUND(longitude, ?)
+            ) cells ON a.id = cells.last_id
+            ORDER BY cells.requests DESC
+            LIMIT ?
+        ''', (analysis_cache.GRID_PRECISION, analysis_cache.GRID_PRECISION, limit))
+        # Only the detected city/state of past addresses is used, and only for known metros
+        locations = [
+            (location_label(address), lat, lon)
+            for address, lat, lon in cursor.fetchall()
+            if is_known_location(address)
+        ]
+    finally:
+        conn.close()
+
+    seen = {analysis_cache.grid_cell(lat, lon) for _, lat, lon in locations}
+    for address, lat, lon in SEED_CITIES:
+        if len(locations) >= limit:
+            break
+        if analysis_cache.grid_cell(lat, lon) not in seen:
+            seen.add(analysis_cache.grid_cell(lat, lon))
+            locations.append((address, lat, lon))
+    return locations
+
+
+def top_profiles(limit, db_path=analysis_cache.DB_PATH):
+    """Most common (bill band, panel type, subsidy) combinations in recent history"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT monthly_bill, panel_type, include_subsidy
+            FROM analyses
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (PROFILE_SAMPLE_SIZE,))
+        counts = Counter(
+            (analysis_cache.bill_band(bill), panel_type, bool(include_subsidy))
+            for bill, panel_type, include_subsidy in cursor
+        )
+    finally:
+        conn.close()
+
+    profiles = [profile for profile, _ in counts.most_common(limit)]
+    for profile in DEFAULT_PROFILES_LIST:
+        if len(profiles) >= limit:
+            break
+        if profile not in profiles:
+            profiles.append(profile)
+    return profiles
+
+
+def run_prefill(cities=DEFAULT_CITIES, profiles=DEFAULT_PROFILES, rate_per_minute=DEFAULT_RATE_PER_MINUTE):
+    """Warm weather and AI cache entries; returns (warmed, failed) counts"""
+    # app needs the Azure/weather credentials at import time, so it's only loaded here
+    from app import AI_CACHE_TTL, WEATHER_CACHE_TTL, analyze_with_openai, calculate_solar_metrics, get_weather_data
+
+    analysis_cache.init_cache_table()
+    purged = analysis_cache.purge_expired()
+    if purged:
+        print(f"Purged {purged} expired cache entries")
+    run_id = analysis_cache.start_prefill_run()
+
+    limiter = RateLimiter(rate_per_minute)
+    profile_list = top_profiles(profiles)
+    warmed = 0
+    failed = 0
+
+    for address, lat, lon in top_locations(cities):
+        cell_lat, cell_lon = analysis_cache.grid_cell(lat, lon)
+        location_data = {'address': address, 'latitude': cell_lat, 'longitude': cell_lon}
+
+        try:
+            limiter.wait()
+            weather_data = get_weather_data(cell_lat, cell_lon)
+            analysis_cache.put(analysis_cache.weather_key(lat, lon), weather_data, WEATHER_CACHE_TTL, prefill_run_id=run_id)
+            warmed += 1
+        except Exception as e:
+            print(f"✗ Weather prefill failed for {address}: {e}")
+            failed += 1
+            continue
+
+        for band, panel_type, include_subsidy in profile_list:
+            monthly_bill = analysis_cache.representative_bill(band)
+            energy_data = {
+                'monthly_bill': monthly_bill,
+                'roof_size': '',
+                'panel_type': panel_type,
+                'include_subsidy': include_subsidy
+            }
+            try:
+                solar_metrics = calculate_solar_metrics(
+                    cell_lat, cell_lon, monthly_bill, '', panel_type, weather_data
+                )
+                ai_analysis = analyze_with_openai(
+                    location_data, energy_data, solar_metrics, weather_data, before_request=limiter.wait
+                )
+                invalid = find_invalid_sections(ai_analysis)
+                if invalid:
+                    raise ValueError(f"incomplete analysis ({', '.join(invalid)})")
+                analysis_cache.put(
+                    analysis_cache.analysis_key(lat, lon, monthly_bill, panel_type, include_subsidy),
+                    cacheable_narrative(ai_analysis),
+                    AI_CACHE_TTL,
+                    prefill_run_id=run_id
+                )
+                warmed += 1
+            except Exception as e:
+                print(f"✗ AI prefill failed for {address} (band {band}, {panel_type}): {e}")
+                failed += 1
+
+        print(f"✓ Prefilled {address}")
+
+    return warmed, failed
+
+
+def print_report(runs=5):
+    """Print hit rates for the most recent prefill runs"""
+    analysis_cache.init_cache_table()
+    prefill_runs = analysis_cache.get_prefill_runs(runs)
+    if not prefill_runs:
+        print("No prefill runs recorded yet")
+        return
+
+    for run in prefill_runs:
+        hit_rate = run['hit_rate']
+        print(
+            f"Run {run['run_id']} ({run['started_at']}): {run['entries_used']}/{run['entries']} entries used, "
+            f"hit rate {'n/a' if hit_rate is None else f'{hit_rate:.1%}'}, {run['hits']} hits"
+        )
+        for kind, counts in sorted(run['by_kind'].items()):
+            print(f"    {kind:<8} {counts['entries_used']}/{counts['entries']} entries used, {counts['hits']} hits")
+
+
+def time_of_day(value):
+    """argparse type for HH:MM (24-hour) times"""
+    try:
+        hour, minute = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}', expected HH:MM")
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise argparse.ArgumentTypeError(f"invalid time '{value}', expected HH:MM")
+    return f"{hour:02d}:{minute:02d}"
+
+
+def seconds_until(at):
+    """Seconds until the next local occurrence of HH:MM"""
+    hour, minute = (int(part) for part in at.split(':'))
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def run_schedule(at, cities, profiles, rate_per_minute):
+    """Run the prefill every day at HH:MM until interrupted; a failed run doesn't stop the schedule"""
+    while True:
+        delay = seconds_until(at)
+        print(f"Next prefill at {at} (in {delay / 3600:.1f} hours)")
+        time.sleep(delay)
+        try:
+            print_report()
+            warmed, failed = run_prefill(cities, profiles, rate_per_minute)
+            print(f"✓ Prefill complete: {warmed} entries warmed, {failed} failed")
+        except Exception as e:
+            print(f"✗ Prefill run failed: {e}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Solar Analysis cache prefill')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('run', 'Prefill the cache once'), ('schedule', 'Prefill the cache daily')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--cities', type=int, default=DEFAULT_CITIES, help='Number of grid cells to warm')
+        sub.add_argument('--profiles', type=int, default=DEFAULT_PROFILES, help='Bill/panel profiles per cell')
+        sub.add_argument('--rate', type=float, default=DEFAULT_RATE_PER_MINUTE, help='Max upstream calls per minute')
+        if name == 'schedule':
+            sub.add_argument('--at', type=time_of_day, default='05:30', help='Local time to run each day (HH:MM)')
+
+    report_parser = subparsers.add_parser('report', help='Show how often prefilled entries are hit')
+    report_parser.add_argument('--runs', type=int, default=5, help='Number of recent runs to show')
+
+    return parser
+
+
+def main(argv=None):
+    """Main CLI entry point"""
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'report':
+        print_report(args.runs)
+    elif args.command == 'run':
+        warmed, failed = run_prefill(args.cities, args.profiles, args.rate)
+        print(f"✓ Prefill complete: {warmed} entries warmed, {failed} failed")
+        return 1 if failed and not warmed else 0
+    elif args.command == 'schedule':
+        try:
+            run_schedule(args.at, args.cities, args.profiles, args.rate)
+        except KeyboardInterrupt:
+            print("\nPrefill schedule stopped")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
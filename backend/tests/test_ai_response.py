@@ -0,0 +1,98 @@
+import json
+
+import ai_response
+
+VENDORS = [{"name": "Sahyadri Solar", "certifications": ["MNRE Approved"]}]
+
+
+def test_parse_plain_json():
+    assert ai_response.parse_response('{"local_vendors": []}') == {"local_vendors": []}
+
+
+def test_parse_strips_code_fences():
+    text = '```json\n{"local_vendors": [{"name": "A"}]}\n```'
+    assert ai_response.parse_response(text) == {"local_vendors": [{"name": "A"}]}
+
+
+def test_parse_removes_trailing_commas():
+    text = '{"factors": ["a", "b",], "score": 80,}'
+    assert ai_response.parse_response(text) == {"factors": ["a", "b"], "score": 80}
+
+
+def test_parse_ignores_prose_around_json():
+    text = 'Here is your analysis:\n{"score": 80}\nLet me know if you need more.'
+    assert ai_response.parse_response(text) == {"score": 80}
+
+
+def test_trailing_comma_fix_leaves_strings_untouched():
+    text = '{"note": "a, ]", "other": "x,}", "escaped": "q\\",]",}'
+    assert json.loads(ai_response.remove_trailing_commas(text)) == {
+        "note": "a, ]",
+        "other": "x,}",
+        "escaped": 'q",]'
+    }
+
+
+def test_salvage_truncated_response():
+    text = (
+        '{"technical_recommendations": ["a, ]", "b",], '
+        '"local_vendors": [{"name": "A", "certifications": []}], '
+        '"financial_analysis": {"roi_perc'
+    )
+    parsed = ai_response.parse_response(text)
+    assert parsed == {
+        "technical_recommendations": ["a, ]", "b"],
+        "local_vendors": [{"name": "A", "certifications": []}]
+    }
+
+
+def test_repair_requests_only_invalid_sections():
+    prompts = []
+
+    def complete(prompt, max_tokens):
+        prompts.append((prompt, max_tokens))
+        return json.dumps({"technical_recommendations": ["Clean panels monthly"]})
+
+    text = json.dumps({"local_vendors": VENDORS, "technical_recommendations": "not a list"})
+    analysis = ai_response.validate_and_repair(text, "PROMPT", complete)
+
+    assert len(prompts) == 1
+    assert '"technical_recommendations"' in prompts[0][0]
+    assert '"local_vendors"' not in prompts[0][0].split("PROMPT", 1)[1]
+    assert analysis["technical_recommendations"] == ["Clean panels monthly"]
+
+
+def test_sections_still_invalid_after_repair_are_dropped():
+    text = json.dumps({
+        "local_vendors": VENDORS,
+        "suitability_assessment": {"overall_score": "[Generate score 60-95]", "factors": ["a"]},
+        "environmental_impact": {"clean_energy_percentage": "85%"}
+    })
+    analysis = ai_response.validate_and_repair(text, "PROMPT", lambda prompt, max_tokens: "{}")
+
+    assert analysis == {"local_vendors": VENDORS}
+
+
+def test_missing_vendors_after_repair_raises():
+    try:
+        ai_response.validate_and_repair("garbage", "PROMPT", lambda prompt, max_tokens: "{}")
+    except ValueError as e:
+        assert "local_vendors" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_repair_parsing_has_its_own_counters():
+    before = ai_response.get_stats()
+    ai_response.validate_and_repair(
+        json.dumps({"local_vendors": VENDORS}),
+        "PROMPT",
+        lambda prompt, max_tokens: "```\n{}\n```, sorry"
+    )
+    after = ai_response.get_stats()
+
+    assert after["parse_failures"] == before["parse_failures"]
+    assert after["parse_repairs"] == before["parse_repairs"]
+    assert after["repair_parse_failures"] + after["repair_parse_repairs"] == (
+        before["repair_parse_failures"] + before["repair_parse_repairs"] + 1
+    )
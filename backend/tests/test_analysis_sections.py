@@ -0,0 +1,121 @@
+import json
+
+import ai_response
+import analysis_cache
+import prefill
+from analysis_sections import cacheable_narrative, is_known_location, location_label, prepare_cached_analysis
+
+ENERGY = {'monthly_bill': 4000, 'roof_size': '', 'panel_type': 'standard', 'include_subsidy': True}
+WEATHER = {'average_sun_hours': 5.5}
+
+# Metrics of the request that generated the cached analysis
+GENERATING_METRICS = {
+    'recommended_capacity_kw': 4.8,
+    'number_of_panels': 12,
+    'estimated_cost': 288000,
+    'annual_savings': 55384,
+    'payback_period_years': 5.2,
+    'co2_reduction_kg_per_year': 5600
+}
+
+# Metrics of a later request in the same bill band
+OTHER_METRICS = {
+    'recommended_capacity_kw': 3.1,
+    'number_of_panels': 8,
+    'estimated_cost': 186000,
+    'annual_savings': 30000,
+    'payback_period_years': 6.2,
+    'co2_reduction_kg_per_year': 3600
+}
+
+GENERATED = {
+    'suitability_assessment': {'overall_score': 88, 'factors': ['A 4.8 kW system fits the roof']},
+    'financial_analysis': {
+        'roi_percentage': 19.2,
+        'break_even_years': 5.2,
+        'total_savings_25_years': 1096600,
+        'investment_grade': 'Excellent'
+    },
+    'technical_recommendations': ['Install 12 panels facing south', 'Expect payback in 5.2 years'],
+    'environmental_impact': {'co2_reduction_tons': 5.6, 'equivalent_trees': 257, 'clean_energy_percentage': 79.5},
+    'local_vendors': [
+        {'name': 'Sahyadri Solar', 'certifications': ['MNRE Approved'], 'estimated_quote': '₹2.6-3.2 lakhs'},
+        {'name': 'Konkan Sun', 'certifications': ['ISO 9001'], 'estimated_quote': '₹3.0-3.3 lakhs'}
+    ],
+    'government_incentives': {'central_subsidy': 30, 'state_subsidy': 10, 'tax_benefits': 'Accelerated depreciation'},
+    'installation_timeline': {
+        'site_survey': '1 week',
+        'approvals': '3 weeks',
+        'installation': '3 days for 12 panels (4.8 kW)',
+        'commissioning': '1 week'
+    }
+}
+
+
+def test_cached_hit_never_repeats_generating_request_numbers():
+    requests = []
+
+    def complete(prompt, max_tokens):
+        requests.append((prompt, max_tokens))
+        return json.dumps({
+            'suitability_assessment': {'overall_score': 82, 'factors': ['A 3.1 kW system fits the roof']},
+            'technical_recommendations': ['Install 8 panels facing south'],
+            'installation_timeline': {
+                'site_survey': '1 week',
+                'approvals': '3 weeks',
+                'installation': '2 days',
+                'commissioning': '1 week'
+            }
+        })
+
+    # Round-trip through JSON like the cache does
+    narrative = json.loads(json.dumps(cacheable_narrative(GENERATED)))
+    partial = prepare_cached_analysis(narrative, ENERGY, OTHER_METRICS, WEATHER)
+    analysis = ai_response.complete_cached_analysis(partial, 'PROMPT', complete)
+
+    assert len(requests) == 1
+    requested = requests[0][0].split('PROMPT', 1)[1]
+    assert '"suitability_assessment"' in requested
+    assert '"technical_recommendations"' in requested
+    assert '"installation_timeline"' in requested
+    assert '"local_vendors"' not in requested
+
+    served = json.dumps(analysis, ensure_ascii=False)
+    for value in ('4.8', '12 panels', '5.2', '2.6-3.2', '3.0-3.3'):
+        assert value not in served
+    assert analysis['financial_analysis']['break_even_years'] == 6.2
+    assert analysis['local_vendors'][0]['estimated_quote'] == '₹1.7-2.0 lakhs'
+    assert analysis['suitability_assessment']['overall_score'] == 82
+
+
+def test_only_known_locations_are_anonymised():
+    assert is_known_location('12 MG Road, Bengaluru')
+    assert location_label('12 MG Road, Bengaluru') == 'Bangalore, Karnataka, India'
+    assert not is_known_location('Main Bazaar, Shimla')
+
+
+def test_cache_errors_behave_like_a_miss(tmp_path):
+    db_path = str(tmp_path / 'missing-tables.db')
+    analysis_cache.put('ai:1', {'a': 1}, 60, db_path=db_path)
+    assert analysis_cache.get('ai:1', db_path=db_path) is None
+
+
+def test_cache_hit_is_returned_and_counted(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    analysis_cache.init_cache_table(db_path)
+    analysis_cache.put('ai:1', {'a': 1}, 60, db_path=db_path)
+
+    assert analysis_cache.get('ai:1', db_path=db_path) == {'a': 1}
+    assert analysis_cache.get_stats(db_path)['total_hits'] == 1
+
+
+def test_schedule_time_is_validated():
+    parser = prefill.build_parser()
+    assert parser.parse_args(['schedule', '--at', '5:30']).at == '05:30'
+    for value in ('25:00', '05:60', 'noon'):
+        try:
+            parser.parse_args(['schedule', '--at', value])
+        except SystemExit:
+            pass
+        else:
+            raise AssertionError(f"expected {value} to be rejected")